@@ -19,48 +19,334 @@ Supported operations:
 Author: Enhanced for safe iCloud management
 """
 
+import atexit
+import ctypes
+import ctypes.util
+import errno
+import functools
+import itertools
+import logging
 import subprocess
 import os
+import select
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import asdict, dataclass
 from pathlib import Path
 import xattr
 
+# The scanning and brctl primitives are shared with main.py in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from icloud_evict import (
+    BRCTL_PATH as _BRCTL_PATH,
+    ICLOUD_ROOT as _ICLOUD_DRIVE_PATH,
+    arg_chunks,
+    evict_batch,
+    iter_files,
+    walk_files_parallel,
+    walk_icloud_music,
+)
+
+logger = logging.getLogger(__name__)
+
+# Per-file debug output is off unless ICLOUD_DEBUG=1; logger.debug defers
+# message formatting so disabled calls cost almost nothing in scan loops
+_DEBUG = os.environ.get("ICLOUD_DEBUG") == "1"
+
+try:
+    from OSAKit import OSAScript, OSALanguage
+except ImportError:
+    OSAScript = None
+
+# AppleScript used to trigger Finder's "Remove Download" action. The path is
+# passed as a handler argument so the script compiles once for the whole run.
+# brctl evict does not need root, so no administrator prompt is requested.
+_EVICT_APPLESCRIPT = '''
+on evictFile(p)
+    tell application "Finder"
+        set theFile to POSIX file p as alias
+        try
+            -- Try to evict the file using Finder's built-in functionality
+            do shell script "touch " & quoted form of p
+            delay 0.1
+            
+            -- Force Finder to refresh file status
+            update theFile
+            
+            -- Use brctl (if available) to evict the file
+            do shell script "brctl evict " & quoted form of p
+            return true
+        on error errMsg
+            try
+                -- Alternative: Use cloud docs management
+                do shell script "cloudctl evict " & quoted form of p
+                return true
+            on error
+                return false
+            end try
+        end try
+    end tell
+end evictFile
+
+on run argv
+    return evictFile(item 1 of argv)
+end run
+'''
+
+# Compiled OSAScript, created lazily by _get_osa_script()
+_osa_script = None
+
+# Script file for the osascript fallback, created lazily by _get_osa_script_file()
+_osa_script_file = None
+
+# Guards creating the two above and every handler call on _osa_script;
+# OSAKit script instances are not safe to use from several threads at once
+_osa_lock = threading.Lock()
+
+# Resolve command-line tools once instead of spawning `which` per file
+_EVICT_PATH = shutil.which('evict')
+
+# Attributes set by remove_download_xattr and prevent_auto_redownload to mark
+# a file as evicted. Each key is written once; the values are the ones the
+# older lists wrote last, so the stored result is unchanged.
+_EVICTION_XATTRS = {
+    # Primary download policies
+    'com.apple.file-provider.download-policy': b'0',
+    'com.apple.clouddocs.download-policy': b'0',
+    # Additional policies to prevent auto-download
+    'com.apple.file-provider.auto-download': b'false',
+    'com.apple.clouddocs.auto-download': b'false',
+    # Explicit eviction markers
+    'com.apple.file-provider.evicted': b'true',
+    # Mark file as not materialized
+    'com.apple.file-provider.materialized': b'false',
+    # Placeholder attributes to reinforce eviction
+    'com.apple.file-provider.placeholder': b'true',
+}
+
+# Subset of _EVICTION_XATTRS that the filesystem accepted on the first file
+_WORKING_XATTRS = None
+
+# User paths are expanded once at import rather than on every call
+_DESKTOP_PATH = os.path.expanduser("~/Desktop")
+
+# Common iCloud locations shown by diagnose_icloud_setup
+_ICLOUD_LOCATIONS = [
+    ("iCloud Desktop", _DESKTOP_PATH),
+    ("iCloud Documents", os.path.expanduser("~/Documents")),
+    ("iCloud Downloads", os.path.expanduser("~/Downloads")),
+    ("Mobile Documents", os.path.expanduser("~/Library/Mobile Documents")),
+    ("iCloud Drive", _ICLOUD_DRIVE_PATH)
+]
+
+# Resolved iCloud Drive root, with trailing separator for prefix checks
+_ICLOUD_ROOT = os.path.realpath(_ICLOUD_DRIVE_PATH) + os.sep
+
+# Extended attribute name prefixes that mark a file as iCloud-managed
+_ICLOUD_PREFIXES = (
+    'com.apple.file-provider',
+    'com.apple.icloud',
+    'com.apple.CloudDocs',
+    'com.apple.clouddocs',
+)
+
+# Attribute names checked by get_icloud_file_status and verify_eviction.
+# _MATERIALIZED_ATTRS and _POLICY_ATTRS are iterated, so their order matters.
+_MATERIALIZED_ATTRS = (
+    'com.apple.file-provider.materialized',
+    'com.apple.icloud.materialized',
+)
+_DOWNLOADING_ATTRS = frozenset({
+    'com.apple.file-provider.downloading',
+    'com.apple.icloud.downloading',
+})
+_PLACEHOLDER_ATTRS = frozenset({
+    'com.apple.icloud.placeholder',
+    'com.apple.file-provider.placeholder',
+})
+_POLICY_ATTRS = (
+    'com.apple.file-provider.download-policy',
+    'com.apple.clouddocs.download-policy',
+    'com.apple.file-provider.auto-download',
+    'com.apple.clouddocs.auto-download',
+    'com.apple.file-provider.evicted',
+)
+
+# On macOS, call libc's listxattr/getxattr directly into a reused per-thread
+# buffer instead of going through the xattr module for every scanned file
+if sys.platform == 'darwin':
+    _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    _libc.listxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int]
+    _libc.listxattr.restype = ctypes.c_ssize_t
+    _libc.getxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p,
+                               ctypes.c_size_t, ctypes.c_uint32, ctypes.c_int]
+    _libc.getxattr.restype = ctypes.c_ssize_t
+    _libc.flistxattr.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int]
+    _libc.flistxattr.restype = ctypes.c_ssize_t
+    _libc.fgetxattr.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_void_p,
+                                ctypes.c_size_t, ctypes.c_uint32, ctypes.c_int]
+    _libc.fgetxattr.restype = ctypes.c_ssize_t
+else:
+    _libc = None
+
+_xattr_buffers = threading.local()
+
+# macOS open flag for descriptors used only to inspect or watch a file
+_O_EVTONLY = getattr(os, 'O_EVTONLY', 0)
+
+# Name of the removal method that last produced a verified eviction
+_PREFERRED_METHOD = None
+
+# Per-file work is I/O bound (xattr calls, subprocess waits), so batch
+# operations run it on a thread pool; _print_lock keeps their output lines whole
+_MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+_print_lock = threading.Lock()
+
+# Evictions spend their time in brctl/osascript and the shared AppleScript,
+# so they get a smaller pool than classification
+_EVICT_WORKERS = 8
+
+# Cap on evictions queued ahead of the pool while a scan is still running
+_MAX_IN_FLIGHT = 64
+
+def _log(message):
+    with _print_lock:
+        print(message)
+
+def _xattr_buffer():
+    buf = getattr(_xattr_buffers, 'buf', None)
+    if buf is None:
+        buf = _xattr_buffers.buf = ctypes.create_string_buffer(4096)
+    return buf
+
+def _fast_listxattr(file_path, fd=None):
+    """
+    List extended attribute names of a file through libc, using the open
+    descriptor fd when given. Falls back to the xattr module off macOS or
+    when the names overflow the buffer.
+    """
+    if _libc is None:
+        return xattr.listxattr(file_path)
+    
+    buf = _xattr_buffer()
+    if fd is not None:
+        size = _libc.flistxattr(fd, buf, len(buf), 0)
+    else:
+        size = _libc.listxattr(os.fsencode(file_path), buf, len(buf), 0)
+    if size < 0:
+        err = ctypes.get_errno()
+        if err == errno.ERANGE:
+            return xattr.listxattr(file_path)
+        raise OSError(err, os.strerror(err), file_path)
+    if size == 0:
+        return []
+    # Names are NUL-terminated; decode the block once and split it. Slicing
+    # the ctypes array copies only the used bytes, unlike buf.raw.
+    return buf[:size - 1].decode('utf-8', 'surrogateescape').split('\0')
+
+def _fast_getxattr(file_path, attr_name, fd=None):
+    """
+    Read one extended attribute value through libc, using the open
+    descriptor fd when given. Falls back to the xattr module off macOS or
+    when the value overflows the buffer.
+    """
+    if _libc is None:
+        return xattr.getxattr(file_path, attr_name)
+    
+    buf = _xattr_buffer()
+    if fd is not None:
+        size = _libc.fgetxattr(fd, attr_name.encode(), buf, len(buf), 0, 0)
+    else:
+        size = _libc.getxattr(os.fsencode(file_path), attr_name.encode(), buf, len(buf), 0, 0)
+    if size < 0:
+        err = ctypes.get_errno()
+        if err == errno.ERANGE:
+            return xattr.getxattr(file_path, attr_name)
+        raise OSError(err, os.strerror(err), file_path)
+    return buf[:size]
+
+@dataclass(slots=True)
+class FileCtx:
+    """
+    Per-file values computed once and shared by the eviction helpers.
+    """
+    abs_path: str
+    base: str
+    size: int
+
+@dataclass(slots=True, frozen=True)
+class ICloudStatus:
+    """
+    iCloud status of a single file, as returned by get_icloud_file_status.
+    Frozen, since cached instances are shared between callers and threads.
+    """
+    is_icloud_file: bool = False
+    is_downloaded: bool = False
+    is_downloading: bool = False
+    is_placeholder: bool = False
+    file_size: int = 0
+    attributes: frozenset = frozenset()
+
+def _file_ctx(file_path):
+    """
+    Return a FileCtx for file_path, building one if given a plain path.
+    Returns None if the file does not exist.
+    """
+    if isinstance(file_path, FileCtx):
+        return file_path
+    abs_path = os.path.abspath(file_path)
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+    return FileCtx(abs_path, os.path.basename(abs_path), st.st_size)
+
+def _display_name(file_path):
+    """
+    File name for log lines, from a plain path or a FileCtx.
+    """
+    if isinstance(file_path, FileCtx):
+        return file_path.base
+    return os.path.basename(file_path)
+
 def remove_download_evict(file_path):
     """
     Remove local download of iCloud file using the evict command.
     This keeps the file in iCloud but removes the local copy.
     """
     try:
-        # Convert to absolute path
-        abs_path = os.path.abspath(file_path)
+        # Resolve absolute path and check the file exists
+        ctx = _file_ctx(file_path)
         
-        # Check if file exists
-        if not os.path.exists(abs_path):
-            print(f"File not found: {abs_path}")
+        if ctx is None:
+            _log(f"File not found: {os.path.abspath(file_path)}")
             return False
             
         # Check if evict command is available
-        try:
-            subprocess.run(['which', 'evict'], check=True, capture_output=True)
-        except subprocess.CalledProcessError:
-            print("⚠️  'evict' command not found on this system")
+        if _EVICT_PATH is None:
+            _log("⚠️  'evict' command not found on this system")
             return False
             
         # Use evict command to remove local copy
-        result = subprocess.run(['evict', abs_path], 
+        result = subprocess.run([_EVICT_PATH, ctx.abs_path], 
                               capture_output=True, 
                               text=True, 
                               check=True)
         
-        print(f"✅ Successfully removed download using evict: {os.path.basename(abs_path)}")
+        _log(f"✅ Successfully removed download using evict: {ctx.base}")
         return True
         
     except subprocess.CalledProcessError as e:
-        print(f"❌ Error evicting file: {e}")
+        _log(f"❌ Error evicting {_display_name(file_path)}: {e}")
         if e.stderr:
-            print(f"   stderr: {e.stderr}")
+            _log(f"   stderr ({_display_name(file_path)}): {e.stderr}")
         return False
     except Exception as e:
-        print(f"❌ Unexpected error with evict: {e}")
+        _log(f"❌ Unexpected error with evict for {_display_name(file_path)}: {e}")
         return False
 
 def remove_download_xattr(file_path):
@@ -68,122 +354,126 @@ def remove_download_xattr(file_path):
     Remove iCloud download using extended attributes (primary method).
     This method manipulates the extended attributes directly.
     """
+    global _WORKING_XATTRS
     try:
-        abs_path = os.path.abspath(file_path)
+        ctx = _file_ctx(file_path)
         
-        if not os.path.exists(abs_path):
-            print(f"File not found: {abs_path}")
+        if ctx is None:
+            _log(f"File not found: {os.path.abspath(file_path)}")
             return False
         
-        # Get initial file size for verification
-        initial_size = os.path.getsize(abs_path)
-        
         # Method 1: Try removing the materialized attribute
         try:
-            xattr.removexattr(abs_path, 'com.apple.file-provider.materialized')
-            print(f"🔄 Removed materialized attribute from: {os.path.basename(abs_path)}")
+            xattr.removexattr(ctx.abs_path, 'com.apple.file-provider.materialized')
+            _log(f"🔄 Removed materialized attribute from: {ctx.base}")
         except OSError:
             pass
             
-        # Method 2: Set comprehensive download policies to prevent re-downloading
-        # This is CRITICAL to prevent macOS from immediately re-downloading the file
-        eviction_attempts = [
-            # Primary download policies
-            ('com.apple.file-provider.download-policy', b'never'),
-            ('com.apple.file-provider.download-policy', b'0'),
-            ('com.apple.clouddocs.download-policy', b'never'),
-            ('com.apple.clouddocs.download-policy', b'0'),
-            # Additional policies to prevent auto-download
-            ('com.apple.file-provider.auto-download', b'0'),
-            ('com.apple.file-provider.auto-download', b'false'),
-            ('com.apple.clouddocs.auto-download', b'0'),
-            ('com.apple.clouddocs.auto-download', b'false'),
-            # Explicit eviction markers
-            ('com.apple.file-provider.evicted', b'1'),
-            ('com.apple.file-provider.evicted', b'true'),
-        ]
+        # Methods 2-4: Set download policies, eviction markers and placeholder
+        # attributes. This is CRITICAL to prevent macOS from immediately
+        # re-downloading the file. Only the keys that worked on the first file
+        # are tried on later files.
+        candidates = _WORKING_XATTRS if _WORKING_XATTRS is not None else _EVICTION_XATTRS.items()
+        working = []
         
-        for attr_name, attr_value in eviction_attempts:
+        for attr_name, attr_value in candidates:
             try:
-                xattr.setxattr(abs_path, attr_name, attr_value)
-                print(f"🔄 Set {attr_name}={attr_value.decode()} for: {os.path.basename(abs_path)}")
+                xattr.setxattr(ctx.abs_path, attr_name, attr_value)
+                working.append((attr_name, attr_value))
+                _log(f"🔄 Set {attr_name}={attr_value.decode()} for: {ctx.base}")
             except OSError:
                 continue
         
-        # Method 3: Ensure file is properly marked as not materialized
-        try:
-            # Mark file as not materialized (multiple variations)
-            xattr.setxattr(abs_path, 'com.apple.file-provider.materialized', b'0')
-            xattr.setxattr(abs_path, 'com.apple.file-provider.materialized', b'false')
-            print(f"🔄 Marked file as not materialized: {os.path.basename(abs_path)}")
-        except OSError:
-            pass
-            
-        # Method 4: Set placeholder attributes to reinforce eviction
-        try:
-            xattr.setxattr(abs_path, 'com.apple.file-provider.placeholder', b'1')
-            xattr.setxattr(abs_path, 'com.apple.file-provider.placeholder', b'true')
-            print(f"🔄 Marked file as placeholder: {os.path.basename(abs_path)}")
-        except OSError:
-            pass
+        if _WORKING_XATTRS is None and working:
+            _WORKING_XATTRS = working
             
-        print(f"✅ Applied xattr changes to: {os.path.basename(abs_path)} (original size: {initial_size:,} bytes)")
+        _log(f"✅ Applied xattr changes to: {ctx.base} (original size: {ctx.size:,} bytes)")
         return True
         
     except Exception as e:
-        print(f"❌ Error with xattr method: {e}")
+        _log(f"❌ Error with xattr method for {_display_name(file_path)}: {e}")
         return False
 
+def _get_osa_script():
+    """
+    Compile the eviction AppleScript once per process via OSAKit.
+    Returns None when OSAKit (pyobjc) is unavailable or compilation fails.
+    """
+    global _osa_script
+    with _osa_lock:
+        if _osa_script is None and OSAScript is not None:
+            script = OSAScript.alloc().initWithSource_language_(
+                _EVICT_APPLESCRIPT, OSALanguage.languageForName_("AppleScript"))
+            compiled, error = script.compileAndReturnError_(None)
+            if compiled:
+                _osa_script = script
+            else:
+                _log(f"⚠️  Could not compile AppleScript: {error}")
+        return _osa_script
+
+def _get_osa_script_file():
+    """
+    Write the eviction AppleScript to a temporary file once per process,
+    compiled with osacompile when available so osascript skips parsing.
+    """
+    global _osa_script_file
+    with _osa_lock:
+        if _osa_script_file is None:
+            script_dir = tempfile.mkdtemp(prefix='icloud-evict-')
+            atexit.register(shutil.rmtree, script_dir, ignore_errors=True)
+            
+            source_file = os.path.join(script_dir, 'evict.applescript')
+            with open(source_file, 'w') as f:
+                f.write(_EVICT_APPLESCRIPT)
+            
+            compiled_file = os.path.join(script_dir, 'evict.scpt')
+            try:
+                subprocess.run(['osacompile', '-o', compiled_file, source_file], 
+                             capture_output=True, check=True)
+                _osa_script_file = compiled_file
+            except (OSError, subprocess.CalledProcessError):
+                _osa_script_file = source_file
+        return _osa_script_file
+
 def remove_download_applescript(file_path):
     """
     Remove iCloud download using AppleScript to trigger Finder's "Remove Download" action.
     This is the most reliable method as it uses the same mechanism as the Finder context menu.
     """
     try:
-        abs_path = os.path.abspath(file_path)
+        ctx = _file_ctx(file_path)
         
-        if not os.path.exists(abs_path):
-            print(f"File not found: {abs_path}")
+        if ctx is None:
+            _log(f"File not found: {os.path.abspath(file_path)}")
             return False
         
-        # AppleScript to trigger "Remove Download" via Finder
-        applescript = f'''
-        tell application "Finder"
-            set theFile to POSIX file "{abs_path}" as alias
-            try
-                -- Try to evict the file using Finder's built-in functionality
-                do shell script "touch '{abs_path}'"
-                delay 0.1
-                
-                -- Force Finder to refresh file status
-                update theFile
-                
-                -- Use brctl (if available) to evict the file
-                do shell script "brctl evict '{abs_path}'" with administrator privileges
-                return true
-            on error errMsg
-                try
-                    -- Alternative: Use cloud docs management
-                    do shell script "cloudctl evict '{abs_path}'"
-                    return true
-                on error
-                    return false
-                end try
-            end try
-        end tell
-        '''
+        # Prefer the in-process OSAKit bridge: the script is compiled once and
+        # each file only costs a handler call instead of an osascript launch
+        script = _get_osa_script()
+        if script is not None:
+            with _osa_lock:
+                result, error = script.executeHandlerWithName_arguments_error_(
+                    "evictFile", [ctx.abs_path], None)
+            if result is not None and result.booleanValue():
+                _log(f"✅ Successfully evicted using AppleScript: {ctx.base}")
+                return True
+            _log(f"⚠️  AppleScript method failed for {ctx.base}: {error}")
+            return False
         
         try:
-            result = subprocess.run(['osascript', '-e', applescript], 
+            result = subprocess.run(['osascript', _get_osa_script_file(), ctx.abs_path], 
                                   capture_output=True, text=True, check=True)
-            print(f"✅ Successfully evicted using AppleScript: {os.path.basename(abs_path)}")
+            if result.stdout.strip() != 'true':
+                _log(f"⚠️  AppleScript method failed for: {ctx.base}")
+                return False
+            _log(f"✅ Successfully evicted using AppleScript: {ctx.base}")
             return True
         except subprocess.CalledProcessError as e:
-            print(f"⚠️  AppleScript method failed: {e.stderr}")
+            _log(f"⚠️  AppleScript method failed for {ctx.base}: {e.stderr}")
             return False
             
     except Exception as e:
-        print(f"❌ Error with AppleScript method: {e}")
+        _log(f"❌ Error with AppleScript method for {_display_name(file_path)}: {e}")
         return False
 
 def remove_download_brctl(file_path):
@@ -191,64 +481,88 @@ def remove_download_brctl(file_path):
     Try using brctl (CloudKit command line tool) to evict files.
     """
     try:
-        abs_path = os.path.abspath(file_path)
+        ctx = _file_ctx(file_path)
         
-        if not os.path.exists(abs_path):
-            print(f"File not found: {abs_path}")
+        if ctx is None:
+            _log(f"File not found: {os.path.abspath(file_path)}")
+            return False
+        
+        if _BRCTL_PATH is None:
+            _log("⚠️  brctl command not found")
             return False
         
         # Try brctl evict command with download policy
         try:
             # First, try to set the download policy to prevent re-downloading
-            policy_result = subprocess.run(['brctl', 'download', abs_path, '--policy', 'never'], 
+            policy_result = subprocess.run([_BRCTL_PATH, 'download', ctx.abs_path, '--policy', 'never'], 
                                          capture_output=True, text=True)
             if policy_result.returncode == 0:
-                print(f"🔄 Set download policy to 'never' for: {os.path.basename(abs_path)}")
+                _log(f"🔄 Set download policy to 'never' for: {ctx.base}")
             
             # Then evict the file
-            result = subprocess.run(['brctl', 'evict', abs_path], 
+            result = subprocess.run([_BRCTL_PATH, 'evict', ctx.abs_path], 
                                   capture_output=True, text=True, check=True)
-            print(f"✅ Successfully evicted using brctl: {os.path.basename(abs_path)}")
+            _log(f"✅ Successfully evicted using brctl: {ctx.base}")
             
             # Double-check the policy is set after eviction
             try:
-                policy_check = subprocess.run(['brctl', 'download', abs_path, '--policy', 'never'], 
+                policy_check = subprocess.run([_BRCTL_PATH, 'download', ctx.abs_path, '--policy', 'never'], 
                                             capture_output=True, text=True)
-                print(f"🔄 Reinforced download policy after eviction")
+                _log(f"🔄 Reinforced download policy after eviction: {ctx.base}")
             except:
                 pass
                 
             return True
         except subprocess.CalledProcessError as e:
-            print(f"⚠️  brctl command failed: {e.stderr}")
-            return False
-        except FileNotFoundError:
-            print("⚠️  brctl command not found")
+            _log(f"⚠️  brctl command failed for {ctx.base}: {e.stderr}")
             return False
             
     except Exception as e:
-        print(f"❌ Error with brctl method: {e}")
+        _log(f"❌ Error with brctl method for {_display_name(file_path)}: {e}")
         return False
 
+def remove_downloads_brctl_batch(file_paths, chunk=64):
+    """
+    Evict many files with brctl, passing up to `chunk` paths per invocation.
+    Returns the list of paths brctl rejected so callers can fall back per file.
+    """
+    if not file_paths:
+        return []
+    
+    if _BRCTL_PATH is None:
+        print("⚠️  brctl command not found")
+        return list(map(os.path.abspath, file_paths))
+    
+    failed = []
+    
+    for batch in arg_chunks(map(os.path.abspath, file_paths), chunk):
+        # Set the download policy for the whole chunk first
+        subprocess.run([_BRCTL_PATH, 'download', '--policy', 'never', *batch], 
+                     capture_output=True, text=True)
+        
+        rejected, stderr = evict_batch(batch)
+        if not rejected:
+            print(f"✅ Evicted {len(batch)} files using brctl")
+            continue
+        
+        print(f"⚠️  brctl rejected {len(rejected)}/{len(batch)} files: {stderr.strip()}")
+        failed.extend(rejected)
+    
+    return failed
+
 def remove_downloads_from_folder(folder_path, recursive=True):
     """
     Remove downloads from all iCloud files in a folder.
     """
-    folder = Path(folder_path)
-    
-    if not folder.exists():
+    if not os.path.exists(folder_path):
         print(f"Folder not found: {folder_path}")
         return
     
-    # Pattern for finding files
-    pattern = "**/*" if recursive else "*"
-    
-    for file_path in folder.glob(pattern):
-        if file_path.is_file():
-            # Check if it's an iCloud file that's downloaded
-            if is_icloud_file_downloaded(str(file_path)):
-                print(f"Removing download for: {file_path}")
-                remove_download_evict(str(file_path))
+    for entry in iter_files(folder_path, recursive):
+        # Check if it's an iCloud file that's downloaded
+        if is_icloud_file_downloaded(entry.path):
+            print(f"Removing download for: {entry.path}")
+            remove_download_evict(entry.path)
 
 def is_icloud_file_downloaded(file_path):
     """
@@ -256,242 +570,336 @@ def is_icloud_file_downloaded(file_path):
     Uses the same logic as get_icloud_file_status for consistency.
     """
     try:
-        status = get_icloud_file_status(file_path)
+        status = get_icloud_file_status(file_path, verify_content=False)
         if status:
-            return status['is_downloaded']
+            return status.is_downloaded
         return False
     except Exception:
         return False
 
-def get_icloud_file_status(file_path):
+@functools.lru_cache(maxsize=8192)
+def _in_icloud_drive(dir_path):
+    """
+    Whether a directory lies inside iCloud Drive. The answer is cached per
+    directory, so files in the same folder resolve the path only once.
+    """
+    return (os.path.realpath(dir_path) + os.sep).startswith(_ICLOUD_ROOT)
+
+def _stat_key(st):
+    """
+    Cache key fields from a stat result. ctime and flags change when
+    extended attributes are set or a file is evicted, so stale entries are
+    never looked up again.
+    """
+    return st.st_mtime_ns, st.st_ctime_ns, st.st_size, getattr(st, 'st_flags', 0)
+
+def get_icloud_file_status_entry(entry):
+    """
+    Get the iCloud status of a file from an os.scandir DirEntry,
+    reusing the entry's cached stat.
+    """
+    try:
+        st = entry.stat(follow_symlinks=False)
+    except OSError:
+        return get_icloud_file_status(entry.path)
+    return _lookup_icloud_file_status(entry.path, st, False)
+
+def get_icloud_file_status(file_path, verify_content=False):
     """
     Get the current iCloud status of a file.
+    verify_content reads the start of the file to confirm the materialized
+    attribute; it is off by default because reading a placeholder can
+    trigger a download.
+    Results are cached until the file's size, times or flags change.
     """
     try:
-        attrs = xattr.listxattr(file_path)
-        status = {
-            'is_icloud_file': False,
-            'is_downloaded': False,
-            'is_downloading': False,
-            'is_placeholder': False,
-            'file_size': 0,
-            'attributes': list(attrs)
-        }
-        
-        # Get file size
+        st = os.stat(file_path)
+    except OSError:
+        st = None
+    return _lookup_icloud_file_status(file_path, st, verify_content)
+
+def _lookup_icloud_file_status(file_path, st, verify_content):
+    """
+    Status lookup shared by both entry points. Errors are reported and
+    returned as None here, outside the cache, so a transient failure is
+    retried on the next call instead of being remembered.
+    """
+    try:
+        if st is None:
+            return _read_icloud_file_status(file_path, None, verify_content)
+        return _cached_icloud_file_status(file_path, *_stat_key(st), verify_content)
+    except Exception as e:
+        _log(f"Error getting file status for {file_path}: {e}")
+        return None
+
+# Sized for a full music library scan. Keys include the stat fields, so a
+# changed file misses instead of returning a stale status.
+@functools.lru_cache(maxsize=65536)
+def _cached_icloud_file_status(file_path, mtime_ns, ctime_ns, size, flags, verify_content):
+    return _read_icloud_file_status(file_path, size, verify_content)
+
+def _read_icloud_file_status(file_path, file_size, verify_content):
+    # One descriptor serves the attribute listing, attribute reads and the
+    # content check instead of each step reopening the path
+    try:
+        fd = os.open(file_path, os.O_RDONLY | _O_EVTONLY | os.O_NONBLOCK)
+    except OSError:
+        fd = None
+    
+    try:
+        return _get_icloud_file_status(file_path, fd, file_size, verify_content)
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+def _get_icloud_file_status(file_path, fd, file_size, verify_content):
+    attrs = _fast_listxattr(file_path, fd)
+    attr_set = frozenset(attrs)
+    
+    # Get file size
+    if file_size is None:
         try:
-            status['file_size'] = os.path.getsize(file_path)
-        except:
-            pass
-        
-        # Check for various iCloud indicators
-        icloud_indicators = [
-            'com.apple.file-provider',
-            'com.apple.icloud',
-            'com.apple.CloudDocs',
-            'com.apple.clouddocs'  # Added this pattern
-        ]
-        
-        icloud_attrs = []
-        for attr in attrs:
-            for indicator in icloud_indicators:
-                if indicator in attr:
-                    icloud_attrs.append(attr)
-                    break
-        
-        # Check if file is in iCloud Drive path (the only guaranteed iCloud location)
-        icloud_drive_path = os.path.expanduser("~/Library/Mobile Documents/com~apple~CloudDocs")
-        
-        # CRITICAL: Only mark as iCloud file if it has actual iCloud attributes
-        # OR if it's in the official iCloud Drive folder
-        if icloud_attrs:
-            status['is_icloud_file'] = True
-            print(f"Debug: File has iCloud attributes: {icloud_attrs}")
-        elif file_path.startswith(icloud_drive_path):
-            # Files in iCloud Drive are iCloud files by definition
-            status['is_icloud_file'] = True
-            print(f"Debug: File is in iCloud Drive folder")
-        else:
-            # Files in Desktop, Documents, etc. are NOT automatically iCloud files
-            # They must have the actual iCloud extended attributes to be considered iCloud files
-            status['is_icloud_file'] = False
-            print(f"Debug: File is NOT an iCloud file (no iCloud attributes, not in iCloud Drive)")
-            
+            file_size = os.stat(file_path).st_size
+        except OSError:
+            file_size = 0
+    
+    # Check for various iCloud indicators
+    icloud_attrs = [attr for attr in attrs if attr.startswith(_ICLOUD_PREFIXES)]
+    
+    # CRITICAL: Only mark as iCloud file if it has actual iCloud attributes
+    # OR if it's in the official iCloud Drive folder
+    if icloud_attrs:
+        logger.debug("Debug: File has iCloud attributes: %s", icloud_attrs)
+    elif _in_icloud_drive(os.path.dirname(file_path)):
+        # Files in iCloud Drive are iCloud files by definition
+        logger.debug("Debug: File is in iCloud Drive folder")
+    else:
+        # Files in Desktop, Documents, etc. are NOT automatically iCloud files
+        # They must have the actual iCloud extended attributes to be considered iCloud files
+        logger.debug("Debug: File is NOT an iCloud file (no iCloud attributes, not in iCloud Drive)")
         # Early return if not an iCloud file - no need to check download status
-        if not status['is_icloud_file']:
-            return status
-            
+        return ICloudStatus(file_size=file_size, attributes=attr_set)
+    
+    is_downloaded = False
+    is_placeholder = False
+        
+    # Check if it's a placeholder (iCloud file not downloaded)
+    # Explicit placeholder indicators override the materialized value,
+    # so that attribute is only read when no indicator is present
+    if not attr_set.isdisjoint(_PLACEHOLDER_ATTRS):
+        is_placeholder = True
+    else:
         # Check if file is downloaded (materialized)
         # Check both the presence and value of materialized attributes
-        materialized_attrs = [
-            'com.apple.file-provider.materialized',
-            'com.apple.icloud.materialized'
-        ]
-        
-        for attr in materialized_attrs:
-            if attr in attrs:
+        for attr in _MATERIALIZED_ATTRS:
+            if attr in attr_set:
                 try:
                     # Check the actual value of the materialized attribute
-                    attr_value = xattr.getxattr(file_path, attr)
-                    print(f"Debug: Found {attr} with value: {attr_value} for {os.path.basename(file_path)}")
-                    
+                    attr_value = _fast_getxattr(file_path, attr, fd)
+                    logger.debug("Debug: Found %s with value: %s for %s", attr, attr_value, file_path)
+                
                     # If the value is b'1' or b'true', the file is downloaded
                     if attr_value in [b'1', b'true', b'True']:
-                        status['is_downloaded'] = True
+                        is_downloaded = True
                         break
                     # If the value is b'0' or b'false', it's not downloaded
                     elif attr_value in [b'0', b'false', b'False']:
-                        status['is_downloaded'] = False
+                        is_downloaded = False
                         break
                     else:
                         # For unclear values, let's actually check what we got
-                        print(f"Debug: Unclear materialized value for {os.path.basename(file_path)}: {attr_value}")
+                        logger.debug("Debug: Unclear materialized value for %s: %s", file_path, attr_value)
                         # If the attribute exists and has any non-zero/non-false value, assume downloaded
                         # This is more in line with how iCloud actually works
                         if attr_value and attr_value != b'':
-                            status['is_downloaded'] = True
+                            is_downloaded = True
                         else:
-                            status['is_downloaded'] = False
+                            is_downloaded = False
                         break
                 except (OSError, IOError) as e:
-                    print(f"Debug: Could not read {attr} for {os.path.basename(file_path)}: {e}")
+                    logger.debug("Debug: Could not read %s for %s: %s", attr, file_path, e)
                     # If we can't read the attribute value, be conservative
-                    status['is_downloaded'] = False
+                    is_downloaded = False
                     break
-                
-        # Check if file is downloading
-        downloading_attrs = [
-            'com.apple.file-provider.downloading',
-            'com.apple.icloud.downloading'
-        ]
-        
-        for attr in downloading_attrs:
-            if attr in attrs:
-                status['is_downloading'] = True
-                break
+
+    # If not explicitly marked as placeholder, use the is_downloaded status
+    if not is_downloaded:
+        is_placeholder = True
+    
+    # Check if file is downloading
+    is_downloading = not attr_set.isdisjoint(_DOWNLOADING_ATTRS)
         
-        # Check if it's a placeholder (iCloud file not downloaded)
-        # More sophisticated placeholder detection
-        if status['is_icloud_file']:
-            # First check for explicit placeholder indicators
-            placeholder_indicators = [
-                'com.apple.icloud.placeholder',
-                'com.apple.file-provider.placeholder'
-            ]
-            for indicator in placeholder_indicators:
-                if indicator in attrs:
-                    status['is_placeholder'] = True
-                    status['is_downloaded'] = False  # Override if we find placeholder indicator
-                    break
-            
-            # If not explicitly marked as placeholder, use the is_downloaded status
-            if not status['is_placeholder'] and not status['is_downloaded']:
-                status['is_placeholder'] = True
+    # Additional verification: check if file content is actually accessible
+    # This helps detect cases where materialized attribute is outdated
+    if verify_content and file_size > 1024:
+        try:
+            # The descriptor is opened for event notification only, without
+            # blocking, so inspecting a placeholder does not download it
+            if fd is None:
+                raise OSError(f"could not open {file_path}")
             
-        # Additional verification: check if file content is actually accessible
-        # This helps detect cases where materialized attribute is outdated
-        if status['is_icloud_file'] and status['file_size'] > 1024:
-            try:
-                with open(file_path, 'rb') as f:
-                    # Try to read a reasonable portion of the file
-                    test_bytes = f.read(min(2048, status['file_size']))
+            # Try to read a reasonable portion of the file
+            test_bytes = os.pread(fd, min(2048, file_size), 0)
+                
+            if len(test_bytes) == 0 and file_size > 0:
+                # File claims to have size but reads as empty = placeholder
+                logger.debug("Debug: File claims %d bytes but reads empty - definitely placeholder", file_size)
+                is_placeholder = True
+                is_downloaded = False
+            elif len(test_bytes) >= min(1024, file_size):
+                # We can read substantial content = likely really downloaded
+                logger.debug("Debug: Successfully read %d bytes from file - appears to be downloaded", len(test_bytes))
+                if not is_downloaded:
+                    logger.debug("Debug: Overriding materialized attribute - file has readable content")
+                    is_downloaded = True
+                    is_placeholder = False
+            else:
+                # Partial read from large file might indicate placeholder
+                if file_size > 10000 and len(test_bytes) < 1000:
+                    logger.debug("Debug: Large file (%d bytes) but only read %d - likely placeholder", file_size, len(test_bytes))
+                    is_placeholder = True
+                    is_downloaded = False
                     
-                    if len(test_bytes) == 0 and status['file_size'] > 0:
-                        # File claims to have size but reads as empty = placeholder
-                        print(f"Debug: File claims {status['file_size']:,} bytes but reads empty - definitely placeholder")
-                        status['is_placeholder'] = True
-                        status['is_downloaded'] = False
-                    elif len(test_bytes) >= min(1024, status['file_size']):
-                        # We can read substantial content = likely really downloaded
-                        print(f"Debug: Successfully read {len(test_bytes)} bytes from file - appears to be downloaded")
-                        if not status['is_downloaded']:
-                            print(f"Debug: Overriding materialized attribute - file has readable content")
-                            status['is_downloaded'] = True
-                            status['is_placeholder'] = False
-                    else:
-                        # Partial read from large file might indicate placeholder
-                        if status['file_size'] > 10000 and len(test_bytes) < 1000:
-                            print(f"Debug: Large file ({status['file_size']:,} bytes) but only read {len(test_bytes)} - likely placeholder")
-                            status['is_placeholder'] = True
-                            status['is_downloaded'] = False
-                            
-            except (OSError, IOError, PermissionError) as e:
-                print(f"Debug: Cannot access file content: {e}")
-                # If we can't read a file that claims to be large, it's probably a placeholder
-                if status['file_size'] > 10000:
-                    status['is_placeholder'] = True
-                    status['is_downloaded'] = False
-        
-        return status
-        
-    except Exception as e:
-        print(f"Error getting file status for {file_path}: {e}")
-        return None
+        except BlockingIOError:
+            # Content would have to be fetched from iCloud = placeholder
+            logger.debug("Debug: File content is not available locally - placeholder")
+            is_placeholder = True
+            is_downloaded = False
+        except OSError as e:
+            logger.debug("Debug: Cannot access file content: %s", e)
+            # If we can't read a file that claims to be large, it's probably a placeholder
+            if file_size > 10000:
+                is_placeholder = True
+                is_downloaded = False
+    
+    return ICloudStatus(
+        is_icloud_file=True,
+        is_downloaded=is_downloaded,
+        is_downloading=is_downloading,
+        is_placeholder=is_placeholder,
+        file_size=file_size,
+        attributes=attr_set,
+    )
 
 def batch_remove_downloads(file_paths):
     """
-    Remove downloads from multiple files at once using smart removal.
+    Remove downloads from multiple files at once.
+    Downloaded iCloud files are evicted with batched brctl calls; only files
+    brctl rejects go through the per-file smart removal.
     """
-    results = []
+    results = {}
     total_files = len(file_paths)
     
     print(f"🚀 Starting batch removal for {total_files} files...")
     
-    for i, file_path in enumerate(file_paths, 1):
-        print(f"\n[{i}/{total_files}] {os.path.basename(file_path)}")
-        
-        # Use smart removal method
-        success = remove_download_smart(file_path)
-        
-        results.append({
-            'file': file_path,
-            'success': success
-        })
+    # Classify every file once so only downloaded iCloud files reach brctl
+    to_evict = []
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        statuses = executor.map(get_icloud_file_status, map(os.path.abspath, file_paths))
+        for file_path, status in zip(file_paths, statuses):
+            if not status or not status.is_icloud_file:
+                _log(f"⚠️  Not an iCloud file: {os.path.basename(file_path)}")
+                results[file_path] = False
+            elif not status.is_downloaded:
+                _log(f"ℹ️  File already evicted: {os.path.basename(file_path)}")
+                results[file_path] = True
+            else:
+                to_evict.append(file_path)
+    
+    rejected = set(remove_downloads_brctl_batch(to_evict))
+    
+    with ThreadPoolExecutor(max_workers=_EVICT_WORKERS) as executor:
+        futures = {}
+        for file_path in to_evict:
+            if os.path.abspath(file_path) in rejected:
+                futures[executor.submit(remove_download_smart, file_path)] = file_path
+            else:
+                # The batch already set the brctl policy for these files
+                futures[executor.submit(prevent_auto_redownload, file_path, use_brctl=False)] = file_path
+                results[file_path] = True
         
-        # Progress indicator
-        if i % 10 == 0 or i == total_files:
-            successful_so_far = sum(1 for r in results if r['success'])
-            print(f"\n📈 Progress: {i}/{total_files} processed, {successful_so_far} successful")
+        for i, future in enumerate(as_completed(futures), 1):
+            file_path = futures[future]
+            if os.path.abspath(file_path) in rejected:
+                results[file_path] = future.result()
+                _log(f"\n[{i}/{len(to_evict)}] {os.path.basename(file_path)}: "
+                     f"{'✅ evicted' if results[file_path] else '❌ failed'}")
+            
+            # Progress indicator
+            if i % 10 == 0 or i == len(to_evict):
+                successful_so_far = sum(1 for ok in results.values() if ok)
+                _log(f"\n📈 Progress: {i}/{len(to_evict)} evicted, {successful_so_far} successful")
     
-    return results
+    return [{'file': file_path, 'success': results[file_path]} for file_path in file_paths]
 
-def find_downloaded_icloud_files(search_path):
+def find_downloaded_icloud_files(search_path, icloud_drive_only=False):
     """
     Find all iCloud files that are currently downloaded in a given path.
+    With icloud_drive_only, files outside iCloud Drive are treated as local
+    (except .icloud stubs) without reading their extended attributes.
     """
     downloaded_files = []
     all_icloud_files = []
-    search_dir = Path(search_path)
     
-    if not search_dir.exists():
+    if not os.path.exists(search_path):
         print(f"Search path does not exist: {search_path}")
         return downloaded_files
     
     print(f"Searching for iCloud files in: {search_path}")
     
+    def classify(entry):
+        # Cheap prefilter: skip listxattr for files that cannot be iCloud
+        # files. Decided per file, since a search path above iCloud Drive
+        # (such as ~/Library/Mobile Documents) contains both kinds.
+        if (icloud_drive_only and not entry.name.endswith('.icloud')
+                and not _in_icloud_drive(os.path.dirname(entry.path))):
+            try:
+                return ICloudStatus(file_size=entry.stat(follow_symlinks=False).st_size)
+            except OSError:
+                return None
+        return get_icloud_file_status_entry(entry)
+    
     file_count = 0
-    for file_path in search_dir.rglob("*"):
-        if file_path.is_file():
-            file_count += 1
-            if file_count % 100 == 0:  # Progress indicator
-                print(f"  Checked {file_count} files...")
-                
-            status = get_icloud_file_status(str(file_path))
-            if status:
-                if status['is_icloud_file']:
-                    all_icloud_files.append(str(file_path))
-                    if status['is_downloaded']:
-                        downloaded_files.append(str(file_path))
-                        print(f"  📱 Downloaded iCloud file: {file_path.name}")
-                    elif status['is_placeholder']:
-                        print(f"  ☁️  Placeholder file: {file_path.name}")
-                    else:
-                        # Show files that are iCloud but status unclear
-                        print(f"  🤔 iCloud file (status unclear): {file_path.name} - size: {status['file_size']:,} bytes")
+    # Progress indicator at most once per second
+    next_report = time.monotonic() + 1.0
+    
+    def record(entry, status):
+        nonlocal file_count, next_report
+        file_count += 1
+        now = time.monotonic()
+        if now >= next_report:
+            _log(f"  Checked {file_count} files...")
+            next_report = now + 1.0
+            
+        if status:
+            if status.is_icloud_file:
+                all_icloud_files.append(entry.path)
+                if status.is_downloaded:
+                    downloaded_files.append(entry.path)
+                    _log(f"  📱 Downloaded iCloud file: {entry.name}")
+                elif status.is_placeholder:
+                    _log(f"  ☁️  Placeholder file: {entry.name}")
                 else:
-                    # Occasionally show non-iCloud files for debugging
-                    if file_count <= 5:  # Show first few files
-                        print(f"  📄 Regular file: {file_path.name} - size: {status['file_size']:,} bytes, attrs: {len(status['attributes'])}")
+                    # Show files that are iCloud but status unclear
+                    _log(f"  🤔 iCloud file (status unclear): {entry.name} - size: {status.file_size:,} bytes")
+            else:
+                # Occasionally show non-iCloud files for debugging
+                if file_count <= 5:  # Show first few files
+                    _log(f"  📄 Regular file: {entry.name} - size: {status.file_size:,} bytes, attrs: {len(status.attributes)}")
+    
+    # Results are consumed while the walk continues; at most a few batches
+    # of pending entries are held, and progress is reported during the scan
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+        for entry in iter_files(search_path):
+            in_flight[executor.submit(classify, entry)] = entry
+            if len(in_flight) >= _MAX_WORKERS * 4:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(in_flight.pop(future), future.result())
+        
+        for future in as_completed(in_flight):
+            record(in_flight[future], future.result())
     
     print(f"\nSummary:")
     print(f"  Total files checked: {file_count}")
@@ -506,27 +914,63 @@ def find_downloaded_icloud_files(search_path):
     
     return downloaded_files
 
+def _wait_for_file_change(file_path, timeout):
+    """
+    Block until the file's attributes or size change, or timeout elapses.
+    Uses a kqueue vnode watch on macOS and falls back to sleeping elsewhere.
+    """
+    if not hasattr(select, 'kqueue') or not _O_EVTONLY:
+        time.sleep(timeout)
+        return
+    
+    try:
+        fd = os.open(file_path, _O_EVTONLY)
+    except OSError:
+        time.sleep(timeout)
+        return
+    
+    kq = select.kqueue()
+    try:
+        kev = select.kevent(fd,
+                            filter=select.KQ_FILTER_VNODE,
+                            flags=select.KQ_EV_ADD | select.KQ_EV_ENABLE | select.KQ_EV_ONESHOT,
+                            fflags=select.KQ_NOTE_ATTRIB | select.KQ_NOTE_EXTEND | select.KQ_NOTE_WRITE)
+        kq.control([kev], 1, timeout)
+    finally:
+        kq.close()
+        os.close(fd)
+
 def verify_eviction(file_path, original_size=None):
     """
     Verify if a file has been successfully evicted from local storage.
+    Checks immediately, then waits (up to 2 seconds in total) for the
+    kernel to report a change to the file before checking again.
+    """
+    for timeout in (0, 0.5, 1.5):
+        if timeout:
+            _wait_for_file_change(file_path, timeout)
+        is_evicted, message = _check_eviction(file_path, original_size)
+        if is_evicted:
+            break
+    return is_evicted, message
+
+def _check_eviction(file_path, original_size):
+    """
+    Check once whether a file has been evicted from local storage.
     """
     try:
-        # Wait a bit longer for the system to process changes
-        import time
-        time.sleep(2)
-        
         status = get_icloud_file_status(file_path)
         if not status:
             return False, "Could not get file status"
             
-        current_size = status['file_size']
+        current_size = status.file_size
         
         # Check if it's now a placeholder
-        if status['is_placeholder']:
+        if status.is_placeholder:
             return True, f"File is now a placeholder (size: {current_size:,} bytes)"
         
         # Check if materialized attribute is gone (most reliable indicator)
-        if not status['is_downloaded']:
+        if not status.is_downloaded:
             return True, "File is no longer marked as downloaded"
         
         # Check if size has decreased significantly (indicating partial eviction)
@@ -534,13 +978,9 @@ def verify_eviction(file_path, original_size=None):
             return True, f"File size reduced from {original_size:,} to {current_size:,} bytes"
         
         # Additional check: see if the materialized attribute was actually removed
-        attrs = status['attributes']
-        materialized_attrs = [
-            'com.apple.file-provider.materialized',
-            'com.apple.icloud.materialized'
-        ]
+        attrs = status.attributes
         
-        has_materialized = any(attr in attrs for attr in materialized_attrs)
+        has_materialized = not attrs.isdisjoint(_MATERIALIZED_ATTRS)
         if not has_materialized:
             return True, "Materialized attributes removed - file should be evicted"
             
@@ -548,18 +988,11 @@ def verify_eviction(file_path, original_size=None):
         # But sometimes macOS takes time to update, so let's be more lenient
         if original_size and current_size == original_size:
             # Check if download policy attributes were set (enhanced check)
-            policy_attrs = [
-                'com.apple.file-provider.download-policy',
-                'com.apple.clouddocs.download-policy',
-                'com.apple.file-provider.auto-download',
-                'com.apple.clouddocs.auto-download',
-                'com.apple.file-provider.evicted'
-            ]
-            has_policy = any(attr in attrs for attr in policy_attrs)
+            has_policy = not attrs.isdisjoint(_POLICY_ATTRS)
             if has_policy:
                 # Check the actual values to see if they're set to prevent download
                 policy_values = []
-                for attr in policy_attrs:
+                for attr in _POLICY_ATTRS:
                     if attr in attrs:
                         try:
                             value = xattr.getxattr(file_path, attr)
@@ -576,25 +1009,27 @@ def verify_eviction(file_path, original_size=None):
 def remove_download_smart(file_path):
     """
     Smart removal that tries multiple methods and verifies success.
+    The method that last produced a verified eviction is tried first.
     """
-    abs_path = os.path.abspath(file_path)
+    global _PREFERRED_METHOD
+    ctx = _file_ctx(file_path)
     
-    if not os.path.exists(abs_path):
-        print(f"❌ File not found: {abs_path}")
+    if ctx is None:
+        _log(f"❌ File not found: {os.path.abspath(file_path)}")
         return False
     
     # Get initial status
-    initial_status = get_icloud_file_status(abs_path)
-    if not initial_status or not initial_status['is_icloud_file']:
-        print(f"⚠️  Not an iCloud file: {os.path.basename(abs_path)}")
+    initial_status = get_icloud_file_status(ctx.abs_path)
+    if not initial_status or not initial_status.is_icloud_file:
+        _log(f"⚠️  Not an iCloud file: {ctx.base}")
         return False
         
-    if not initial_status['is_downloaded']:
-        print(f"ℹ️  File already evicted: {os.path.basename(abs_path)}")
+    if not initial_status.is_downloaded:
+        _log(f"ℹ️  File already evicted: {ctx.base}")
         return True
         
-    initial_size = initial_status['file_size']
-    print(f"🎯 Evicting: {os.path.basename(abs_path)} ({initial_size:,} bytes)")
+    initial_size = initial_status.file_size
+    _log(f"🎯 Evicting: {ctx.base} ({initial_size:,} bytes)")
     
     # Try methods in order of effectiveness
     methods = [
@@ -603,67 +1038,71 @@ def remove_download_smart(file_path):
         ("xattr", remove_download_xattr),
         ("evict", remove_download_evict)
     ]
+    if _PREFERRED_METHOD is not None:
+        methods.sort(key=lambda method: method[0] != _PREFERRED_METHOD)
     
     for method_name, method_func in methods:
-        print(f"🔄 Trying {method_name} method...")
+        _log(f"🔄 Trying {method_name} method for: {ctx.base}")
         
-        if method_func(abs_path):
-            print(f"✅ {method_name} method executed successfully")
+        if method_func(ctx):
+            _log(f"✅ {method_name} method executed successfully for: {ctx.base}")
             
             # IMMEDIATELY set policies to prevent re-downloading
             # This is crucial - set policies before verification to prevent race conditions
-            prevent_auto_redownload(abs_path)
+            prevent_auto_redownload(ctx)
             
             # Verify the eviction worked
-            is_evicted, message = verify_eviction(abs_path, initial_size)
-            print(f"🔍 Verification: {message}")
+            is_evicted, message = verify_eviction(ctx.abs_path, initial_size)
+            _log(f"🔍 Verification for {ctx.base}: {message}")
             
             if is_evicted:
-                print(f"✅ Successfully evicted using {method_name}")
+                _log(f"✅ Successfully evicted {ctx.base} using {method_name}")
+                _PREFERRED_METHOD = method_name
                 
                 # Reinforce the anti-redownload policies one more time
-                prevent_auto_redownload(abs_path)
+                prevent_auto_redownload(ctx)
                 
                 return True
             else:
-                print(f"⚠️  {method_name} method may have worked, but verification is inconclusive")
+                _log(f"⚠️  {method_name} method may have worked for {ctx.base}, but verification is inconclusive")
                 # Even if verification is unclear, the policies might help
                 # Don't immediately fail - the eviction might be processing
                 continue
         else:
-            print(f"❌ {method_name} method failed")
+            _log(f"❌ {method_name} method failed for: {ctx.base}")
     
     # If no method definitively succeeded, try a delayed verification
-    print(f"\n🔄 Attempting delayed verification...")
-    if check_eviction_after_delay(abs_path, initial_size):
+    _log(f"\n🔄 Attempting delayed verification for: {ctx.base}")
+    if check_eviction_after_delay(ctx.abs_path, initial_size):
         return True
     
     # Final check - sometimes the methods work but verification is tricky
-    print(f"\n🔍 Final status check...")
-    final_status = get_icloud_file_status(abs_path)
+    _log(f"\n🔍 Final status check for: {ctx.base}")
+    final_status = get_icloud_file_status(ctx.abs_path)
     if final_status:
-        print(f"📊 Final file status:")
-        print(f"   File size: {final_status['file_size']:,} bytes")
-        print(f"   Is iCloud file: {final_status['is_icloud_file']}")
-        print(f"   Is downloaded: {final_status['is_downloaded']}")
-        print(f"   Is placeholder: {final_status['is_placeholder']}")
-        print(f"   Attributes: {final_status['attributes']}")
+        # One call, so the block is not split by other workers' output
+        _log(f"📊 Final file status for {ctx.base}:\n"
+             f"   File size: {final_status.file_size:,} bytes\n"
+             f"   Is iCloud file: {final_status.is_icloud_file}\n"
+             f"   Is downloaded: {final_status.is_downloaded}\n"
+             f"   Is placeholder: {final_status.is_placeholder}\n"
+             f"   Attributes: {final_status.attributes}")
         
         # If the file shows as not downloaded or is a placeholder, consider it successful
-        if not final_status['is_downloaded'] or final_status['is_placeholder']:
-            print(f"✅ File appears to be successfully evicted!")
+        if not final_status.is_downloaded or final_status.is_placeholder:
+            _log(f"✅ File appears to be successfully evicted: {ctx.base}")
             # Make sure anti-redownload policies are set even if eviction was partial
-            prevent_auto_redownload(abs_path)
+            prevent_auto_redownload(ctx)
             return True
     
     # Last ditch effort: even if we can't confirm eviction, set the policies
     # This might prevent the file from being immediately re-downloaded
-    print(f"\n🛡️  Setting anti-redownload policies as final safety measure...")
-    prevent_auto_redownload(abs_path)
+    _log(f"\n🛡️  Setting anti-redownload policies as final safety measure for: {ctx.base}")
+    prevent_auto_redownload(ctx)
     
-    print(f"❌ Could not confirm successful eviction for: {os.path.basename(abs_path)}")
-    print(f"💡 Note: The file may still be evicted - check in Finder to see if it shows a cloud icon")
-    print(f"🛡️  Anti-redownload policies have been set to help prevent automatic re-downloading")
+    _log(f"❌ Could not confirm successful eviction for: {ctx.base}")
+    _log(f"💡 Note: The file may still be evicted - check in Finder to see if it shows a cloud icon\n"
+         f"🛡️  Anti-redownload policies have been set to help prevent automatic re-downloading")
     return False
 
 def diagnose_icloud_setup():
@@ -674,34 +1113,27 @@ def diagnose_icloud_setup():
     print("=" * 50)
     
     # Check common iCloud locations
-    icloud_locations = [
-        ("iCloud Desktop", os.path.expanduser("~/Desktop")),
-        ("iCloud Documents", os.path.expanduser("~/Documents")),
-        ("iCloud Downloads", os.path.expanduser("~/Downloads")),
-        ("Mobile Documents", os.path.expanduser("~/Library/Mobile Documents")),
-        ("iCloud Drive", os.path.expanduser("~/Library/Mobile Documents/com~apple~CloudDocs"))
-    ]
-    
     print("\n📁 Checking iCloud locations:")
-    for name, path in icloud_locations:
+    for name, path in _ICLOUD_LOCATIONS:
         if os.path.exists(path):
             print(f"✅ {name}: {path}")
             # Check a few files in each location
             try:
-                files = list(Path(path).iterdir())[:3]  # First 3 items
-                for file_path in files:
-                    if file_path.is_file():
-                        status = get_icloud_file_status(str(file_path))
-                        if status:
-                            attrs_summary = f"({len(status['attributes'])} attrs)"
-                            icloud_status = "iCloud" if status['is_icloud_file'] else "Local"
-                            download_status = ""
-                            if status['is_icloud_file']:
-                                if status['is_downloaded']:
-                                    download_status = " - Downloaded"
-                                elif status['is_placeholder']:
-                                    download_status = " - Placeholder"
-                            print(f"    📄 {file_path.name} - {icloud_status}{download_status} {attrs_summary}")
+                # Only the first 3 entries are read, however large the folder
+                with os.scandir(path) as it:
+                    for entry in itertools.islice(it, 3):
+                        if entry.is_file():
+                            status = get_icloud_file_status(entry.path, verify_content=True)
+                            if status:
+                                attrs_summary = f"({len(status.attributes)} attrs)"
+                                icloud_status = "iCloud" if status.is_icloud_file else "Local"
+                                download_status = ""
+                                if status.is_icloud_file:
+                                    if status.is_downloaded:
+                                        download_status = " - Downloaded"
+                                    elif status.is_placeholder:
+                                        download_status = " - Placeholder"
+                                print(f"    📄 {entry.name} - {icloud_status}{download_status} {attrs_summary}")
             except Exception as e:
                 print(f"    ⚠️  Error checking files: {e}")
         else:
@@ -713,18 +1145,29 @@ def diagnose_icloud_setup():
     print(f"Current directory: {current_dir}")
     
     try:
-        files = list(current_dir.iterdir())[:5]
-        for file_path in files:
-            if file_path.is_file():
-                status = get_icloud_file_status(str(file_path))
-                if status:
-                    print(f"  📄 {file_path.name}:")
-                    print(f"     iCloud file: {status['is_icloud_file']}")
-                    print(f"     Downloaded: {status['is_downloaded']}")
-                    print(f"     Attributes: {status['attributes']}")
+        with os.scandir(current_dir) as it:
+            for entry in itertools.islice(it, 5):
+                if entry.is_file():
+                    status = get_icloud_file_status(entry.path, verify_content=True)
+                    if status:
+                        print(f"  📄 {entry.name}:")
+                        print(f"     iCloud file: {status.is_icloud_file}")
+                        print(f"     Downloaded: {status.is_downloaded}")
+                        print(f"     Attributes: {status.attributes}")
     except Exception as e:
         print(f"Error checking current directory: {e}")
 
+def _classify_and_pin(entry):
+    """
+    Set anti-redownload policies on a scanned file if it is an iCloud file.
+    Returns True when policies were applied.
+    """
+    status = get_icloud_file_status_entry(entry)
+    if status and status.is_icloud_file:
+        prevent_auto_redownload(entry.path)
+        return True
+    return False
+
 # Interactive example
 def interactive_icloud_manager():
     """
@@ -751,6 +1194,10 @@ def interactive_icloud_manager():
         
         choice = input("\nEnter your choice (1-9): ").strip()
         
+        # Each menu action starts with an empty status cache, so entries from
+        # an earlier scan do not pin memory for the rest of the session
+        _cached_icloud_file_status.cache_clear()
+        
         if choice == "1":
             file_path = input("Enter file path: ").strip()
             remove_download_smart(file_path)
@@ -758,8 +1205,9 @@ def interactive_icloud_manager():
         elif choice == "2":
             folder_path = input("Enter folder path (or press Enter for Desktop): ").strip()
             if not folder_path:
-                folder_path = os.path.expanduser("~/Desktop")
-            files = find_downloaded_icloud_files(folder_path)
+                folder_path = _DESKTOP_PATH
+            drive_only = input("Only check files inside iCloud Drive? (y/n): ").strip().lower() == 'y'
+            files = find_downloaded_icloud_files(folder_path, icloud_drive_only=drive_only)
             print(f"\nFound {len(files)} downloaded iCloud files:")
             for f in files[:10]:  # Show first 10
                 print(f"  - {f}")
@@ -769,8 +1217,9 @@ def interactive_icloud_manager():
         elif choice == "3":
             folder_path = input("Enter folder path (or press Enter for Desktop): ").strip()
             if not folder_path:
-                folder_path = os.path.expanduser("~/Desktop")
-            files = find_downloaded_icloud_files(folder_path)
+                folder_path = _DESKTOP_PATH
+            drive_only = input("Only check files inside iCloud Drive? (y/n): ").strip().lower() == 'y'
+            files = find_downloaded_icloud_files(folder_path, icloud_drive_only=drive_only)
             if files:
                 confirm = input(f"Remove downloads from {len(files)} files? (y/n): ")
                 if confirm.lower() == 'y':
@@ -782,10 +1231,10 @@ def interactive_icloud_manager():
                 
         elif choice == "4":
             file_path = input("Enter file path: ").strip()
-            status = get_icloud_file_status(file_path)
+            status = get_icloud_file_status(file_path, verify_content=True)
             if status:
                 print(f"\nFile status for {file_path}:")
-                for key, value in status.items():
+                for key, value in asdict(status).items():
                     print(f"  {key}: {value}")
             else:
                 print("Could not get file status")
@@ -806,13 +1255,19 @@ def interactive_icloud_manager():
                 prevent_auto_redownload(path)
             elif os.path.isdir(path):
                 print(f"🔄 Setting policies for all files in: {path}")
+                # Submitted as the walker yields, with at most
+                # _MAX_WORKERS * 4 pending; executor.map would drain the
+                # whole walk before returning the first result
                 count = 0
-                for file_path in Path(path).rglob("*"):
-                    if file_path.is_file():
-                        status = get_icloud_file_status(str(file_path))
-                        if status and status['is_icloud_file']:
-                            prevent_auto_redownload(str(file_path))
-                            count += 1
+                in_flight = set()
+                with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+                    for entry in walk_files_parallel(path):
+                        in_flight.add(executor.submit(_classify_and_pin, entry))
+                        if len(in_flight) >= _MAX_WORKERS * 4:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            count += sum(future.result() for future in done)
+                    
+                    count += sum(future.result() for future in as_completed(in_flight))
                 print(f"✅ Set anti-redownload policies on {count} iCloud files")
             else:
                 print("❌ Path not found or not accessible")
@@ -824,20 +1279,68 @@ def interactive_icloud_manager():
         else:
             print("Invalid choice. Please try again.")
 
+def _iter_downloaded_music(locations, counts):
+    """
+    Yield DirEntry objects for downloaded iCloud music files as the walk
+    finds them. counts['music'] and counts['downloaded'] are updated in place.
+    Output goes through _log, since eviction workers write while it runs.
+    """
+    for location_name, location_path in locations:
+        if not os.path.exists(location_path):
+            _log(f"❌ {location_name} not found: {location_path}")
+            continue
+            
+        _log(f"\n🔍 Searching {location_name}: {location_path}")
+        
+        try:
+            file_count = 0
+            downloaded_count = 0
+            next_report = time.monotonic() + 1.0
+            
+            # The walker only yields music files, filtered by extension in its workers
+            for entry in walk_icloud_music(location_path):
+                file_count += 1
+                counts['music'] += 1
+                
+                # Progress indicator for large directories, at most once per second
+                now = time.monotonic()
+                if now >= next_report:
+                    _log(f"   Checked {file_count} music files...")
+                    next_report = now + 1.0
+                
+                # Evicted iCloud files have no local data; the size comes
+                # from the entry's cached stat, so skip the xattr check
+                try:
+                    if entry.stat(follow_symlinks=False).st_size == 0:
+                        _log(f"   ☁️  Placeholder music: {entry.name}")
+                        continue
+                except OSError:
+                    continue
+                
+                # Check if it's downloaded
+                status = get_icloud_file_status_entry(entry)
+                if status and status.is_icloud_file and status.is_downloaded:
+                    downloaded_count += 1
+                    counts['downloaded'] += 1
+                    _log(f"   📱 Downloaded music: {entry.name}")
+                    yield entry
+                elif status and status.is_icloud_file and status.is_placeholder:
+                    _log(f"   ☁️  Placeholder music: {entry.name}")
+            
+            _log(f"   Found {file_count} music files, {downloaded_count} downloaded")
+            
+        except Exception as e:
+            _log(f"   ❌ Error searching {location_name}: {e}")
+
 # Example usage with common iCloud folders
 def find_and_evict_all_music_files():
     """
     Find and evict all music files from iCloud Drive and common iCloud locations.
+    Downloaded files are handed to the eviction pool as soon as they are found.
     """
-    # Common music file extensions
-    music_extensions = {
-        '.mp3', '.m4a', '.aac', '.flac', '.wav', '.ogg', '.wma', 
-        #'.m4p', '.mp4', '.mov', '.avi', '.mkv'  # Also include video files that might be music videos
-    }
-    
     # iCloud locations to search
     icloud_locations = [
-        ("iCloud Drive", os.path.expanduser("~/Library/Mobile Documents/com~apple~CloudDocs")),
+        ("iCloud Drive", _ICLOUD_DRIVE_PATH),
         #("iCloud Desktop", os.path.expanduser("~/Desktop")),
         #("iCloud Documents", os.path.expanduser("~/Documents")),
         #("iCloud Downloads", os.path.expanduser("~/Downloads"))
@@ -846,96 +1349,71 @@ def find_and_evict_all_music_files():
     print("🎵 Finding all music files in iCloud locations...")
     print("=" * 60)
     
-    all_music_files = []
-    downloaded_music_files = []
+    # Files are evicted while the scan runs, so confirm before it starts;
+    # a dry run only counts what would be evicted
+    print("\n⚠️  Downloaded music files will be evicted from local storage as they are found.")
+    print("   The files will remain in iCloud but won't take up local disk space.")
+    confirm = input("   Continue? (y = evict, d = dry run, n = cancel): ").strip().lower()
     
-    for location_name, location_path in icloud_locations:
-        if not os.path.exists(location_path):
-            print(f"❌ {location_name} not found: {location_path}")
-            continue
-            
-        print(f"\n🔍 Searching {location_name}: {location_path}")
-        
-        try:
-            file_count = 0
-            location_music_files = []
-            location_downloaded_files = []
+    if confirm not in ('y', 'd'):
+        print("❌ Operation cancelled.")
+        return
+    
+    counts = {'music': 0, 'downloaded': 0}
+    downloaded_music = _iter_downloaded_music(icloud_locations, counts)
+    
+    successful_evictions = 0
+    failed_evictions = 0
+    
+    if confirm == 'd':
+        for _ in downloaded_music:
+            pass
+    else:
+        # Results are written as they arrive, through the same lock as the
+        # scanner and the workers, so lines stay in the order they happened
+        def record(entry, success):
+            nonlocal successful_evictions, failed_evictions
+            if success:
+                successful_evictions += 1
+            else:
+                failed_evictions += 1
             
-            for file_path in Path(location_path).rglob("*"):
-                if file_path.is_file():
-                    file_count += 1
-                    
-                    # Progress indicator for large directories
-                    if file_count % 500 == 0:
-                        print(f"   Checked {file_count} files...")
-                    
-                    # Check if it's a music file
-                    if file_path.suffix.lower() in music_extensions:
-                        location_music_files.append(str(file_path))
-                        
-                        # Check if it's downloaded
-                        status = get_icloud_file_status(str(file_path))
-                        if status and status['is_icloud_file'] and status['is_downloaded']:
-                            location_downloaded_files.append(str(file_path))
-                            print(f"   📱 Downloaded music: {file_path.name}")
-                        elif status and status['is_icloud_file'] and status['is_placeholder']:
-                            print(f"   ☁️  Placeholder music: {file_path.name}")
+            processed = successful_evictions + failed_evictions
+            _log(f"\n[{processed}] {'Evicted' if success else 'Failed'}: {entry.name}")
             
-            print(f"   Found {len(location_music_files)} music files, {len(location_downloaded_files)} downloaded")
-            all_music_files.extend(location_music_files)
-            downloaded_music_files.extend(location_downloaded_files)
+            # Progress update every 10 files
+            if processed % 10 == 0:
+                _log(f"📈 Progress: {processed} processed\n"
+                     f"   ✅ Successful: {successful_evictions}\n"
+                     f"   ❌ Failed: {failed_evictions}")
+        
+        # Each eviction mostly waits on brctl/osascript, so run several at
+        # once; the walker keeps scanning on its own pool meanwhile. At most
+        # _MAX_IN_FLIGHT evictions are queued, so memory stays flat.
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=_EVICT_WORKERS) as executor:
+            for entry in downloaded_music:
+                in_flight[executor.submit(remove_download_smart, entry.path)] = entry
+                if len(in_flight) >= _MAX_IN_FLIGHT:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(in_flight.pop(future), future.result())
             
-        except Exception as e:
-            print(f"   ❌ Error searching {location_name}: {e}")
+            for future in as_completed(in_flight):
+                record(in_flight[future], future.result())
     
     print(f"\n📊 Summary:")
-    print(f"   Total music files found: {len(all_music_files)}")
-    print(f"   Downloaded music files: {len(downloaded_music_files)}")
+    print(f"   Total music files found: {counts['music']}")
+    print(f"   Downloaded music files: {counts['downloaded']}")
     
-    if not downloaded_music_files:
+    if not counts['downloaded']:
         print("\n✅ No downloaded music files found - nothing to evict!")
         return
     
-    # Show some examples
-    print(f"\n📂 Sample downloaded music files:")
-    for i, file_path in enumerate(downloaded_music_files[:10]):
-        print(f"   {i+1}. {os.path.basename(file_path)}")
-    
-    if len(downloaded_music_files) > 10:
-        print(f"   ... and {len(downloaded_music_files) - 10} more")
-    
-    # Ask for confirmation
-    print(f"\n⚠️  This will evict {len(downloaded_music_files)} music files from local storage.")
-    print("   The files will remain in iCloud but won't take up local disk space.")
-    confirm = input("   Continue? (y/n): ").strip().lower()
-    
-    if confirm != 'y':
-        print("❌ Operation cancelled.")
+    if confirm == 'd':
+        print("\n💡 Dry run - no files were evicted.")
         return
     
-    # Evict the files
-    print(f"\n🚀 Starting eviction of {len(downloaded_music_files)} music files...")
-    
-    successful_evictions = 0
-    failed_evictions = 0
-    
-    for i, file_path in enumerate(downloaded_music_files, 1):
-        print(f"\n[{i}/{len(downloaded_music_files)}] Evicting: {os.path.basename(file_path)}")
-        
-        # Use the smart removal function
-        success = remove_download_smart(file_path)
-        
-        if success:
-            successful_evictions += 1
-        else:
-            failed_evictions += 1
-        
-        # Progress update every 10 files
-        if i % 10 == 0 or i == len(downloaded_music_files):
-            print(f"📈 Progress: {i}/{len(downloaded_music_files)} processed")
-            print(f"   ✅ Successful: {successful_evictions}")
-            print(f"   ❌ Failed: {failed_evictions}")
-    
     # Final summary
     print(f"\n🎯 Final Results:")
     print(f"   ✅ Successfully evicted: {successful_evictions} files")
@@ -955,20 +1433,19 @@ def check_eviction_after_delay(file_path, original_size, delay_seconds=5):
     Check if eviction was successful after a delay.
     Sometimes iCloud takes time to process eviction requests.
     """
-    import time
-    print(f"⏳ Waiting {delay_seconds} seconds for iCloud to process eviction...")
+    _log(f"⏳ Waiting {delay_seconds} seconds for iCloud to process eviction of: {os.path.basename(file_path)}")
     time.sleep(delay_seconds)
     
     try:
         is_evicted, message = verify_eviction(file_path, original_size)
         if is_evicted:
-            print(f"✅ Delayed verification successful: {message}")
+            _log(f"✅ Delayed verification successful for {os.path.basename(file_path)}: {message}")
             return True
         else:
-            print(f"❓ Delayed verification inconclusive: {message}")
+            _log(f"❓ Delayed verification inconclusive for {os.path.basename(file_path)}: {message}")
             return False
     except Exception as e:
-        print(f"❌ Error in delayed verification: {e}")
+        _log(f"❌ Error in delayed verification for {os.path.basename(file_path)}: {e}")
         return False
 
 def debug_file_attributes(file_path):
@@ -1001,10 +1478,10 @@ def debug_file_attributes(file_path):
                 print(f"  {attr} = (could not read: {e})")
         
         # Show what our function thinks about this file
-        status = get_icloud_file_status(file_path)
+        status = get_icloud_file_status(file_path, verify_content=True)
         if status:
             print(f"\n📊 Our analysis:")
-            for key, value in status.items():
+            for key, value in asdict(status).items():
                 print(f"  {key}: {value}")
         
         # Also check with ls command for comparison
@@ -1019,63 +1496,52 @@ def debug_file_attributes(file_path):
     except Exception as e:
         print(f"❌ Error debugging file: {e}")
 
-def prevent_auto_redownload(file_path):
+def prevent_auto_redownload(file_path, use_brctl=True):
     """
     Set comprehensive attributes to prevent automatic re-downloading of evicted files.
     This should be called after eviction to ensure files stay evicted.
+    use_brctl=False skips the per-file `brctl download --policy never`, for
+    files whose policy a batched call has already set.
     """
     try:
-        abs_path = os.path.abspath(file_path)
+        ctx = _file_ctx(file_path)
         
-        if not os.path.exists(abs_path):
+        if ctx is None:
             return False
         
-        print(f"🛡️  Setting persistent eviction policies for: {os.path.basename(abs_path)}")
-        
-        # Set multiple download policy attributes to be extra sure
-        policy_attributes = [
-            ('com.apple.file-provider.download-policy', b'never'),
-            ('com.apple.file-provider.download-policy', b'0'),
-            ('com.apple.clouddocs.download-policy', b'never'),
-            ('com.apple.clouddocs.download-policy', b'0'),
-            ('com.apple.file-provider.auto-download', b'0'),
-            ('com.apple.file-provider.auto-download', b'false'),
-            ('com.apple.clouddocs.auto-download', b'0'),
-            ('com.apple.clouddocs.auto-download', b'false'),
-            ('com.apple.file-provider.evicted', b'1'),
-            ('com.apple.file-provider.evicted', b'true'),
-            ('com.apple.file-provider.materialized', b'0'),
-            ('com.apple.file-provider.materialized', b'false'),
-            ('com.apple.file-provider.placeholder', b'1'),
-            ('com.apple.file-provider.placeholder', b'true'),
-        ]
+        _log(f"🛡️  Setting persistent eviction policies for: {ctx.base}")
         
+        # Set the download policy attributes, one write per attribute
         success_count = 0
-        for attr_name, attr_value in policy_attributes:
+        for attr_name, attr_value in _EVICTION_XATTRS.items():
             try:
-                xattr.setxattr(abs_path, attr_name, attr_value)
+                xattr.setxattr(ctx.abs_path, attr_name, attr_value)
                 success_count += 1
             except OSError:
                 continue
         
-        print(f"✅ Set {success_count}/{len(policy_attributes)} eviction policies")
+        _log(f"✅ Set {success_count}/{len(_EVICTION_XATTRS)} eviction policies for: {ctx.base}")
         
         # Also try using brctl to set policy if available
+        if not use_brctl or _BRCTL_PATH is None:
+            return success_count > 0
         try:
-            subprocess.run(['brctl', 'download', abs_path, '--policy', 'never'], 
+            subprocess.run([_BRCTL_PATH, 'download', ctx.abs_path, '--policy', 'never'], 
                          capture_output=True, text=True, check=True)
-            print(f"✅ Set brctl download policy to 'never'")
+            _log(f"✅ Set brctl download policy to 'never' for: {ctx.base}")
         except:
             pass
             
         return success_count > 0
         
     except Exception as e:
-        print(f"❌ Error setting eviction policies: {e}")
+        _log(f"❌ Error setting eviction policies for {_display_name(file_path)}: {e}")
         return False
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG if _DEBUG else logging.INFO, format="%(message)s")
+    
     # Uncomment to run interactive manager
     interactive_icloud_manager()
     
@@ -0,0 +1,197 @@
+"""
+Shared scanning and eviction primitives for the iCloud music evictors.
+
+Used by main.py and archive/program.py so both walk the tree and call
+brctl the same way.
+"""
+
+import os
+import queue
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ICLOUD_ROOT = os.path.expanduser("~/Library/Mobile Documents/com~apple~CloudDocs")
+
+# Common music file extensions
+MUSIC_EXT = frozenset({
+    '.mp3', '.m4a', '.aac', '.flac', '.wav', '.ogg', '.wma',
+    #'.m4p', '.mp4', '.mov', '.avi', '.mkv'  # Also include video files that might be music videos
+})
+
+# Matches names ending in one of MUSIC_EXT, without lowercasing each name
+MUSIC_RE = re.compile(
+    r'\.(?:%s)\Z' % '|'.join(sorted(re.escape(ext[1:]) for ext in MUSIC_EXT)),
+    re.IGNORECASE,
+)
+
+# Resolved once instead of searching PATH per call
+BRCTL_PATH = shutil.which('brctl')
+
+# brctl evict accepts many paths; batch them to avoid one process per file,
+# keeping each command line well under ARG_MAX (half is left for the environment)
+EVICT_BATCH_SIZE = 64
+EVICT_ARG_BYTES = os.sysconf('SC_ARG_MAX') // 2
+
+def iter_files(dirpath, recursive=True):
+    """
+    Yield DirEntry objects for regular files under dirpath.
+    Uses os.scandir so file type and stat results come from the cached entry,
+    with an explicit stack of pending directories instead of recursion.
+    """
+    pending = [dirpath]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except OSError:
+            # Unreadable directories are skipped
+            continue
+
+def walk_files_parallel(dirpath, max_workers=16, name_re=None):
+    """
+    Yield DirEntry objects for regular files under dirpath, scanning
+    directories concurrently on a thread pool. Order is not preserved.
+    Each scandir blocks on the file provider, so overlapping them hides
+    most of the iCloud metadata latency.
+    If name_re is given, workers drop files whose name it does not
+    match, so the caller only sees candidates.
+    """
+    # Each scanned directory puts its files on the queue; None marks the end.
+    # Subdirectories are counted before their parent finishes, so pending
+    # only reaches zero once the whole tree has been scanned.
+    results = queue.Queue()
+    pending = 1
+    pending_lock = threading.Lock()
+
+    def scan(path):
+        nonlocal pending
+        files = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        with pending_lock:
+                            pending += 1
+                        try:
+                            executor.submit(scan, entry.path)
+                        except RuntimeError:
+                            # Pool is shutting down because the caller stopped iterating
+                            with pending_lock:
+                                pending -= 1
+                    elif entry.is_file(follow_symlinks=False):
+                        if name_re is not None and not name_re.search(entry.name):
+                            continue
+                        files.append(entry)
+        except OSError:
+            # Unreadable directories are skipped
+            pass
+        finally:
+            results.put(files)
+            with pending_lock:
+                pending -= 1
+                finished = pending == 0
+            if finished:
+                results.put(None)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        executor.submit(scan, dirpath)
+        while (files := results.get()) is not None:
+            yield from files
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def walk_icloud_music(root, max_workers=16):
+    """
+    Yield DirEntry objects for music files under root, walked in parallel.
+    """
+    return walk_files_parallel(root, max_workers, name_re=MUSIC_RE)
+
+def is_evicted(filepath):
+    """
+    Whether a file is evicted: either an empty dataless file or missing
+    with a `.name.icloud` placeholder next to it.
+    """
+    try:
+        stat_info = os.stat(filepath)
+    except OSError:
+        base_name = os.path.basename(filepath)
+        dir_name = os.path.dirname(filepath)
+        icloud_name = f".{base_name}.icloud"
+        return os.path.exists(os.path.join(dir_name, icloud_name))
+    return stat_info.st_size == 0
+
+def is_evicted_entry(entry):
+    """
+    is_evicted for a scanned entry. Usually only its size matters, but the
+    file may have been replaced by a `.name.icloud` stub since the scan.
+    """
+    try:
+        return entry.stat(follow_symlinks=False).st_size == 0
+    except OSError:
+        return is_evicted(entry.path)
+
+def arg_chunks(paths, chunk=EVICT_BATCH_SIZE):
+    """
+    Split paths into lists of at most `chunk` entries whose combined length
+    stays under EVICT_ARG_BYTES, so each fits on one command line.
+    """
+    batch = []
+    batch_bytes = 0
+    for path in paths:
+        path_bytes = len(os.fsencode(path)) + 1
+        if batch and (len(batch) >= chunk or batch_bytes + path_bytes > EVICT_ARG_BYTES):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(path)
+        batch_bytes += path_bytes
+    if batch:
+        yield batch
+
+def _named_paths(paths, text):
+    """
+    Paths that appear in text as a whole token, not just as a substring,
+    so /a/song.mp3 is not matched by a line about /a/song.mp3.bak.
+    """
+    lines = text.splitlines()
+    named = []
+    for path in paths:
+        token = re.compile(r'(?:^|[\s\'"])%s(?=$|[\s\'":,])' % re.escape(path))
+        if any(token.search(line) for line in lines):
+            named.append(path)
+    return named
+
+def evict_batch(batch):
+    """
+    Run one `brctl evict` over batch. Returns the paths brctl rejected and
+    its stderr. Callers check BRCTL_PATH first.
+    """
+    result = subprocess.run([BRCTL_PATH, 'evict', *batch],
+                            capture_output=True, text=True)
+    if result.returncode == 0:
+        return [], result.stderr
+
+    # brctl names the paths it could not handle on stderr; if none can be
+    # matched, treat the whole batch as failed
+    rejected = _named_paths(batch, result.stderr)
+    return rejected or list(batch), result.stderr
+
+def evict_many(paths, chunk=EVICT_BATCH_SIZE):
+    """
+    Evict paths with batched brctl calls. paths may be a generator; each
+    batch is evicted as soon as it fills. Yields (rejected, stderr) for
+    every batch brctl did not fully accept.
+    """
+    for batch in arg_chunks(paths, chunk):
+        rejected, stderr = evict_batch(batch)
+        if rejected:
+            yield rejected, stderr
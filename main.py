@@ -1,34 +1,44 @@
-import os
-import subprocess
+import sys
 
-user = 'dennisporter'
+from icloud_evict import BRCTL_PATH, ICLOUD_ROOT, evict_many, is_evicted_entry, walk_icloud_music
 
-def is_icloud_file_evicted(filepath):
-    if not os.path.exists(filepath):
-        base_name = os.path.basename(filepath)
-        dir_name = os.path.dirname(filepath)
-        icloud_name = f".{base_name}.icloud"
-        return os.path.exists(os.path.join(dir_name, icloud_name))
-    else:
-        stat_info = os.stat(filepath)
-        return stat_info.st_size == 0
+def flush_output(lines):
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        lines.clear()
 
-def evict_icloud_file(filepath):
-    subprocess.run(["brctl", "evict", filepath], check=False)
+def iter_pending_evictions(root_path, output):
+    # Per-file lines are buffered in output and written in blocks of 64
+    for entry in walk_icloud_music(root_path):
+        if is_evicted_entry(entry):
+            output.append(f"Already evicted: {entry.path}")
+        else:
+            yield entry.path
+            # Logged once the consumer asks for the next path: arg_chunks reads
+            # one path past a full batch before yielding it, and that path's
+            # line must come after the batch's failures, not before them
+            output.append(f"Evicting: {entry.path}")
+
+        if len(output) >= 64:
+            flush_output(output)
 
 def find_and_evict_music_files(root_path):
-    music_extensions = ['.mp3', '.m4a', '.flac', '.wav', '.aac', '.ogg', '.wma']
-    
-    for root, dirs, files in os.walk(root_path):
-        for file in files:
-            if any(file.lower().endswith(ext) for ext in music_extensions):
-                filepath = os.path.join(root, file)
-                if not is_icloud_file_evicted(filepath):
-                    print(f"Evicting: {filepath}")
-                    evict_icloud_file(filepath)
-                else:
-                    print(f"Already evicted: {filepath}")
+    if BRCTL_PATH is None:
+        print("brctl not found; cannot evict files")
+        return
 
-icloud_path = f"/Users/{user}/Library/Mobile Documents/com~apple~CloudDocs"
-find_and_evict_music_files(icloud_path)
+    # evict_many pulls paths lazily, so batches go to brctl while the walk
+    # continues and failures are reported as each batch finishes
+    output = []
+    for rejected, stderr in evict_many(iter_pending_evictions(root_path, output)):
+        # Flush first so failures follow the "Evicting" lines they relate to
+        flush_output(output)
+        if stderr:
+            sys.stderr.write(stderr)
+        for filepath in rejected:
+            print(f"Failed to evict: {filepath}")
+    flush_output(output)
 
+if __name__ == "__main__":
+    find_and_evict_music_files(ICLOUD_ROOT)